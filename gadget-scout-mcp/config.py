@@ -11,6 +11,7 @@ SMARTPHONE_DB_PATH = "../smartphone_db.json"  # Will be created from notebook da
 # Conversation Settings
 MAX_HISTORY_LENGTH = 10  # Keep last 10 queries in context
 CONTEXT_WINDOW_SIZE = 3  # Show last 3 queries in summaries
+CONTEXT_CACHE_SIZE = 256  # Generated query contexts kept per conversation state
 
 # Analytics
 ENABLE_ANALYTICS = True
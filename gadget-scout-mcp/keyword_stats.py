@@ -0,0 +1,63 @@
+"""
+Keyword frequency report - Reorders classifier keywords by observed hits
+
+Reads user queries (one per line) from the given files or stdin and prints a
+_CATEGORY_KEYWORDS literal for prompts/query_context.py with each category's
+keywords sorted by descending hit count. Category order is kept as-is, since
+it is the classification priority.
+
+Usage:
+    python keyword_stats.py queries.txt
+"""
+
+import fileinput
+import json
+from collections import Counter
+
+from prompts.query_context import _CATEGORY_KEYWORDS
+
+
+def count_keyword_hits(queries):
+    """Count how many queries contain each classifier keyword"""
+    hits = Counter()
+    for query in queries:
+        query_lower = query.lower()
+        for keywords in _CATEGORY_KEYWORDS.values():
+            for keyword in keywords:
+                if keyword in query_lower:
+                    hits[keyword] += 1
+    return hits
+
+
+def rank_category_keywords(hits):
+    """_CATEGORY_KEYWORDS with each category's keywords ordered by hit count"""
+    # sorted() is stable, so unseen keywords keep their current order
+    return {
+        category: tuple(sorted(keywords, key=lambda kw: hits[kw], reverse=True))
+        for category, keywords in _CATEGORY_KEYWORDS.items()
+    }
+
+
+def format_category_keywords(hits) -> str:
+    """Render _CATEGORY_KEYWORDS with keywords ordered by hit count"""
+    lines = ["_CATEGORY_KEYWORDS = {"]
+    entries = []
+    for category, ranked in rank_category_keywords(hits).items():
+        quoted = ", ".join(json.dumps(kw, ensure_ascii=False) for kw in ranked)
+        entries.append(f"    {json.dumps(category)}: ({quoted})")
+    lines.append(",\n".join(entries))
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def main():
+    """Main entry point"""
+    queries = [line.strip() for line in fileinput.input() if line.strip()]
+    hits = count_keyword_hits(queries)
+    
+    print(f"# Keyword order from {len(queries)} queries")
+    print(format_category_keywords(hits))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,134 +2,223 @@
 Query Context Generator - Creates brilliant context for each query
 """
 
-from typing import Dict, Any, List
+from typing import Dict, List
 import re
 
+from resources.conversation import ConversationContext
+from resources.patterns import compile_keyword_groups, compile_keywords
+
+
+# Category keywords, in classification priority order. Within a category the
+# order is free; keyword_stats.py regenerates it by observed hit frequency.
+_CATEGORY_KEYWORDS = {
+    "comparison": ("compare", "vs", "versus", "which is better", "difference between"),
+    "recommendation": ("best", "recommend", "suggest", "should i", "which phone"),
+    "specific_information": ("what is", "tell me about", "specs", "price", "cost", "review"),
+    "budget_search": ("under", "below", "budget", "₹", "inr"),
+    "feature_search": ("camera", "battery", "performance", "display")
+}
+
+# Keywords that signal a comparison / make a "better" question specific
+_COMPARE_KW = ("compare", "vs")
+_BETTER_FEATURE_KW = ("camera", "battery", "performance", "price")
+
+# Simple extraction - known brand/model aliases mapped to one canonical name
+_KNOWN_PHONES = {
+    "samsung galaxy s24 ultra": "samsung galaxy s24 ultra",
+    "samsung s24 ultra": "samsung galaxy s24 ultra",
+    "s24 ultra": "samsung galaxy s24 ultra",
+    "iphone 15 pro max": "iphone 15 pro max",
+    "iphone 15": "iphone 15",
+    "iphone": "iphone",
+    "oneplus 12": "oneplus 12",
+    "oneplus": "oneplus",
+    "pixel 8 pro": "pixel 8 pro",
+    "pixel": "pixel",
+    "xiaomi 14": "xiaomi 14",
+    "xiaomi": "xiaomi"
+}
+
+
+# Compiled once at import and shared by every generator instance
+_CATEGORY_PRIORITY = tuple(_CATEGORY_KEYWORDS)
+_CATEGORY_RE = compile_keyword_groups(_CATEGORY_KEYWORDS)
+_COMPARE_RE = compile_keywords(_COMPARE_KW)
+_BETTER_FEATURE_RE = compile_keywords(_BETTER_FEATURE_KW)
+_DIGIT_RE = re.compile(r"\d")
+# Longest alias first, so each span yields one non-overlapping longest match
+_PHONE_RE = compile_keywords(sorted(_KNOWN_PHONES, key=len, reverse=True))
+
+# Section headers of the generated context
+_TOOLS_HEADER = "🧰 AVAILABLE TOOLS:"
+_HISTORY_HEADER = "🗂️ CONVERSATION HISTORY:"
+_ANALYSIS_HEADER = "🔍 QUERY ANALYSIS:"
+_SUGGESTIONS_HEADER = "💡 SMART SUGGESTIONS:"
+_RELEVANT_DATA_HEADER = "📊 RELEVANT DATA:"
+_APPROACH_HEADER = "🎯 RECOMMENDED APPROACH:"
+
 
 class QueryContextGenerator:
     """Generates intelligent, query-specific context for the LLM"""
     
-    def __init__(self, conversation_tracker, tool_registry):
+    def __init__(self, conversation_tracker, tool_registry, cache_size: int = 256):
         self.conversation = conversation_tracker
         self.tools = tool_registry
+        
+        # Memoized build_stable_prefix() output and the context it was built from
+        self._prefix = ""
+        self._prefix_history = None
+        
+        # Generated contexts by lowercased query, valid for one context snapshot
+        self._contexts: Dict[str, str] = {}
+        self._cache_size = cache_size
+        self._cache_history = None
     
     def generate_context(self, query: str) -> str:
-        """Generate brilliant context for the current query"""
-        
-        # Analyze the query
-        query_type = self._classify_query(query)
-        missing_info = self._identify_missing_info(query)
+        """Generate brilliant context for the current query
         
-        # Get conversation history
+        Sections run from most to least stable across turns (tools, history,
+        preferences, then the query itself), so consecutive prompts share the
+        longest possible unchanged prefix for LLM-side prompt caching.
+        """
+        # Output depends only on the lowercased query and the conversation snapshot
         history = self.conversation.get_context()
+        if history is not self._cache_history:
+            self.clear_cache()
+            self._cache_history = history
         
-        # Generate smart suggestions
-        suggestions = self._generate_suggestions(query, query_type, history)
-        
-        # Get relevant data
-        relevant_data = self._get_relevant_data(query, history)
+        query_lower = query.lower()
+        context = self._contexts.get(query_lower)
+        if context is None:
+            context = self._build_context(query_lower)
+            if self._cache_size > 0:
+                if len(self._contexts) >= self._cache_size:
+                    # Drop the oldest entry; the next snapshot clears them all anyway
+                    del self._contexts[next(iter(self._contexts))]
+                self._contexts[query_lower] = context
+        return context
+    
+    def clear_cache(self):
+        """Drop all cached contexts"""
+        self._contexts.clear()
+    
+    def _build_context(self, query_lower: str) -> str:
+        """Build the full context for a (lowercased) query"""
+        return self.build_stable_prefix() + "\n\n" + self.build_dynamic_suffix(query_lower)
+    
+    def build_stable_prefix(self) -> str:
+        """Tool registry and committed history; unchanged until the next tracked query"""
         
-        # Recommend approach
-        approach = self._recommend_approach(query, query_type, history)
-        
-        # Build context
-        context = f"""
-🔍 QUERY ANALYSIS:
-- Type: {query_type}
-- Missing Info: {missing_info or "None - query is complete"}
-- User History: {self._summarize_history(history)}
-- Conversation Theme: {history.get('conversation_theme', 'initial_exploration')}
-
-💡 SMART SUGGESTIONS:
-{suggestions}
-
-📊 RELEVANT DATA:
-{relevant_data}
-
-🎯 RECOMMENDED APPROACH:
-{approach}
-"""
-        return context.strip()
+        history = self.conversation.get_context()
+        # A new context snapshot is only produced after track_query, so it keys the cache
+        if history is self._prefix_history:
+            return self._prefix
+        
+        lines = [_TOOLS_HEADER]
+        lines.extend(
+            f"- {tool['name']}: {tool['description']}"
+            for tool in self.tools.get_all_tools()
+        )
+        lines.extend((
+            "",
+            _HISTORY_HEADER,
+            "- User History: " + self._summarize_history(history),
+            "- Conversation Theme: " + history.conversation_theme
+        ))
+        
+        self._prefix = "\n".join(lines)
+        self._prefix_history = history
+        return self._prefix
     
-    def _classify_query(self, query: str) -> str:
-        """Classify the query type"""
-        query_lower = query.lower()
+    def build_dynamic_suffix(self, query_lower: str) -> str:
+        """Preferences and the analysis of the current (already lowercased) query"""
         
-        # Comparison
-        if any(word in query_lower for word in ["compare", "vs", "versus", "which is better", "difference between"]):
-            return "comparison"
+        # Analyze the query once; helpers share the results
+        query_type = self._classify_query(query_lower)
+        phones = self._extract_phone_names(query_lower)
         
-        # Recommendation
-        if any(word in query_lower for word in ["best", "recommend", "suggest", "should i", "which phone"]):
-            return "recommendation"
+        # Get conversation history once and share it with every helper
+        history = self.conversation.get_context()
         
-        # Specific info
-        if any(word in query_lower for word in ["what is", "tell me about", "specs", "price", "cost", "review"]):
-            return "specific_information"
+        missing_info = self._identify_missing_info(query_lower, phones, history)
         
-        # Budget search
-        if any(word in query_lower for word in ["under", "below", "budget", "₹", "inr"]):
-            return "budget_search"
+        # Generate smart suggestions
+        suggestions = self._generate_suggestions(query_type, phones, history)
+        
+        # Get relevant data
+        relevant_data = self._get_relevant_data(query_lower, history)
         
-        # Feature search
-        if any(word in query_lower for word in ["camera", "battery", "performance", "display"]):
-            return "feature_search"
+        # Recommend approach
+        approach = self._recommend_approach(query_type, phones, history)
+        
+        return "\n".join((
+            _RELEVANT_DATA_HEADER,
+            relevant_data,
+            "",
+            _ANALYSIS_HEADER,
+            "- Type: " + query_type,
+            "- Missing Info: " + (missing_info or "None - query is complete"),
+            "",
+            _SUGGESTIONS_HEADER,
+            suggestions,
+            "",
+            _APPROACH_HEADER,
+            approach
+        ))
+    
+    def _classify_query(self, query_lower: str) -> str:
+        """Classify the (lowercased) query type"""
+        # Single pass over the query collects every matching category
+        hits = set()
+        for match in _CATEGORY_RE.finditer(query_lower):
+            if match.lastgroup == _CATEGORY_PRIORITY[0]:
+                return match.lastgroup
+            hits.add(match.lastgroup)
+        
+        for category in _CATEGORY_PRIORITY:
+            if category in hits:
+                return category
         
         return "general_inquiry"
     
-    def _identify_missing_info(self, query: str) -> str:
-        """Identify what information is missing from the query"""
-        query_lower = query.lower()
+    def _identify_missing_info(self, query_lower: str, phones: List[str], history: ConversationContext) -> str:
+        """Identify what information is missing from the (lowercased) query"""
         missing = []
         
         # Check for comparison without phone names
-        if "compare" in query_lower or "vs" in query_lower:
+        if _COMPARE_RE.search(query_lower):
             # Check if we have phone names
-            phones = self._extract_phone_names(query)
             if len(phones) < 2:
                 missing.append("Need two phone names to compare")
         
         # Check for vague "better" questions
-        if "better" in query_lower and not any(word in query_lower for word in ["camera", "battery", "performance", "price"]):
+        if "better" in query_lower and not _BETTER_FEATURE_RE.search(query_lower):
             # Check if context provides the phones
-            history = self.conversation.get_context()
-            last_queries = history.get("last_3_queries", [])
+            last_queries = history.last_3_queries
             if not last_queries:
                 missing.append("Need to know which phones to compare")
         
         # Check for budget without amount
-        if "budget" in query_lower and not re.search(r'\d+', query):
+        if "budget" in query_lower and not _DIGIT_RE.search(query_lower):
             missing.append("Budget amount not specified")
         
         return "; ".join(missing) if missing else None
     
-    def _extract_phone_names(self, query: str) -> List[str]:
-        """Extract phone names from query"""
-        # Simple extraction - look for known brands/models
-        known_phones = [
-            "samsung galaxy s24 ultra", "samsung s24 ultra", "s24 ultra",
-            "iphone 15 pro max", "iphone 15", "iphone",
-            "oneplus 12", "oneplus",
-            "pixel 8 pro", "pixel",
-            "xiaomi 14", "xiaomi"
-        ]
-        
-        found = []
-        query_lower = query.lower()
-        for phone in known_phones:
-            if phone in query_lower:
-                found.append(phone)
-        
-        return found
+    def _extract_phone_names(self, query_lower: str) -> List[str]:
+        """Extract canonical phone names from the (lowercased) query, in mention order"""
+        # "s24 ultra" inside "samsung galaxy s24 ultra" is the same phone, not a second one
+        return list(dict.fromkeys(
+            _KNOWN_PHONES[match.group()] for match in _PHONE_RE.finditer(query_lower)
+        ))
     
-    def _summarize_history(self, history: Dict[str, Any]) -> str:
+    def _summarize_history(self, history: ConversationContext) -> str:
         """Summarize conversation history"""
-        query_count = history.get("query_count", 0)
+        query_count = history.query_count
         
         if query_count == 0:
             return "This is the first query"
         
-        last_queries = history.get("last_3_queries", [])
+        last_queries = history.last_3_queries
         if not last_queries:
             return f"{query_count} queries so far"
         
@@ -139,20 +228,19 @@ class QueryContextGenerator:
         
         return summary
     
-    def _generate_suggestions(self, query: str, query_type: str, history: Dict[str, Any]) -> str:
+    def _generate_suggestions(self, query_type: str, phones: List[str], history: ConversationContext) -> str:
         """Generate smart suggestions based on query and history"""
         
         suggestions = []
         
         if query_type == "comparison":
-            phones = self._extract_phone_names(query)
             if len(phones) >= 2:
                 suggestions.append(f"1. Call compare_specs('{phones[0]}', '{phones[1]}')")
                 suggestions.append(f"2. Call get_price for both to show price difference")
                 suggestions.append(f"3. Call get_reviews for both to validate with user feedback")
             else:
                 # Check history for context
-                last_queries = history.get("last_3_queries", [])
+                last_queries = history.last_3_queries
                 if last_queries:
                     suggestions.append("1. User might be referring to previously discussed phones")
                     suggestions.append("2. Ask clarifying question OR use context to infer phones")
@@ -175,11 +263,11 @@ class QueryContextGenerator:
         
         return "\n".join(suggestions) if suggestions else "No specific suggestions"
     
-    def _get_relevant_data(self, query: str, history: Dict[str, Any]) -> str:
+    def _get_relevant_data(self, query: str, history: ConversationContext) -> str:
         """Get relevant data from history or database"""
         
         # Check if query mentions phones from history
-        prefs = history.get("inferred_preferences", {})
+        prefs = history.inferred_preferences
         brands = prefs.get("brands_interested", [])
         
         if brands:
@@ -192,16 +280,15 @@ class QueryContextGenerator:
         
         return "No specific relevant data from history"
     
-    def _recommend_approach(self, query: str, query_type: str, history: Dict[str, Any]) -> str:
+    def _recommend_approach(self, query_type: str, phones: List[str], history: ConversationContext) -> str:
         """Recommend the best approach for this query"""
         
         if query_type == "comparison":
-            phones = self._extract_phone_names(query)
             if len(phones) >= 2:
                 return f"Directly compare {phones[0]} and {phones[1]} using compare_specs, then enhance with pricing and reviews"
             else:
-                last_queries = history.get("last_3_queries", [])
-                if last_queries and "compare" in last_queries[-1].get("query", "").lower():
+                # The tracker keeps each query lowercased, so no re-lowering here
+                if "compare" in self.conversation.get_last_query_lower():
                     return "User is likely continuing previous comparison - use context to infer phones"
                 else:
                     return "Ask clarifying question: 'Which phones would you like me to compare?'"
@@ -0,0 +1,45 @@
+"""
+Conversation Summary - Renders the conversation summary prompt
+
+Shared by the MCP server and the Colab client so both produce the same text.
+"""
+
+from resources.conversation import ConversationTracker
+
+
+# Conversation summary templates
+_SUMMARY_HEADER = "\nCONVERSATION SUMMARY\n" + "━" * 44 + "\n\n📝 Queries So Far: {}\n\n"
+_PREF_HEADER = "🎯 Inferred Preferences:\n"
+_THEME_FMT = "\n🔑 Conversation Theme: {}\n"
+
+
+def build_summary(conversation: ConversationTracker) -> str:
+    """Render the tracker's current conversation as the summary prompt"""
+    ctx = conversation.get_context()
+    
+    # Collect fragments and join once instead of repeated string +=
+    parts = [_SUMMARY_HEADER.format(ctx.query_count)]
+    # Add last queries; raw records carry the tool list pre-joined at track time
+    parts.extend(
+        f"{i}️⃣ \"{query_record['query']}\"\n"
+        f"   Tools Used: {query_record['_tools_called_str']}\n\n"
+        for i, query_record in enumerate(conversation.get_last_n_records(3), 1)
+    )
+    
+    # Add inferred preferences
+    prefs = ctx.inferred_preferences
+    if prefs:
+        budget = prefs.get('budget_range')
+        features = ', '.join(prefs.get('priority_features') or ())
+        brands = ', '.join(prefs.get('brands_interested') or ())
+        parts.append(_PREF_HEADER)
+        if budget:
+            parts.append(f"   Budget: {budget}\n")
+        if features:
+            parts.append(f"   Features: {features}\n")
+        if brands:
+            parts.append(f"   Brands: {brands}\n")
+    
+    parts.append(_THEME_FMT.format(ctx.conversation_theme))
+    
+    return "".join(parts).strip()
@@ -2,10 +2,55 @@
 Conversation Tracker - Manages conversation history and context
 """
 
+from dataclasses import dataclass, fields
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-import json
-from collections import defaultdict
+import time
+from typing import List, Dict, Any, Optional, Deque
+from collections import Counter, defaultdict, deque
+from itertools import islice
+import re
+
+from resources.patterns import compile_keyword_groups, compile_keywords
+from resources.serialization import dumps_compact, dumps_pretty
+
+
+# Preference keyword tables
+_BUDGET_KW = ("budget", "under", "below", "₹", "inr", "price")
+_BUDGET_NUMBER_RE = re.compile(r'₹?\s*(\d+(?:,\d+)*)')
+_FEATURE_KW = {
+    "camera": ("camera", "photography", "photo", "video"),
+    "battery": ("battery", "charging", "power"),
+    "performance": ("performance", "speed", "processor", "gaming"),
+    "display": ("display", "screen", "amoled"),
+    "storage": ("storage", "memory", "gb")
+}
+_BRANDS = ("samsung", "apple", "iphone", "oneplus", "google", "pixel", "xiaomi")
+
+
+# Compiled once at import and shared by every tracker instance
+_BUDGET_RE = compile_keywords(_BUDGET_KW)
+_FEATURE_RE = compile_keyword_groups(_FEATURE_KW)
+_BRAND_RE = compile_keywords(_BRANDS, overlapping=True)
+
+
+@dataclass(slots=True)
+class ConversationContext:
+    """Snapshot of the conversation, shared by all consumers until the next track_query
+    
+    The snapshot and its nested lists/dicts are shared, and to_json() is cached
+    from them, so callers must treat it as read-only. Each rebuild creates new
+    containers, so a snapshot held across track_query stays unchanged.
+    """
+    session_id: Optional[str]
+    query_count: int
+    last_3_queries: List[Dict[str, Any]]
+    inferred_preferences: Dict[str, Any]
+    conversation_theme: str
+    tool_usage_stats: Dict[str, int]
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Plain dict view (same keys as the exported JSON)"""
+        return {field.name: getattr(self, field.name) for field in fields(self)}
 
 
 class ConversationTracker:
@@ -13,10 +58,27 @@ class ConversationTracker:
     
     def __init__(self, max_history: int = 10):
         self.max_history = max_history
-        self.query_history: List[Dict[str, Any]] = []
+        # Oldest records fall off the left once max_history is reached
+        self.query_history: Deque[Dict[str, Any]] = deque(maxlen=max_history)
         self.tool_usage_stats = defaultdict(int)
         self.current_session_id: Optional[str] = None
         
+        # Cached get_context() result, rebuilt only after track_query
+        self._context_cache: Optional[ConversationContext] = None
+        self._json_cache: Dict[bool, str] = {}  # Keyed by pretty flag
+        self._dirty = True
+        
+        # Preference aggregates over the retained history window
+        self._reset_preferences()
+    
+    def _reset_preferences(self):
+        """Clear the rolling preference aggregates"""
+        self._tool_counts = Counter()  # Tool calls within the retained window
+        self._budget_count = 0
+        self._latest_budget: Optional[str] = None
+        self._comparison_count = 0
+        self._comparisons = deque(maxlen=3)  # Last 3 comparisons
+    
     def track_query(
         self,
         query: str,
@@ -25,114 +87,165 @@ class ConversationTracker:
         session_id: str
     ):
         """Track a query and its tool usage"""
+        # Invalidate first, so a failure partway through never leaves a stale snapshot
+        self._dirty = True
         
         # Update session
         if self.current_session_id != session_id:
             self.current_session_id = session_id
-            self.query_history = []  # Reset for new session
+            self.query_history.clear()  # Reset for new session
+            self._reset_preferences()
         
         # Add to history
         query_record = {
             "query": query,
             "tools_called": tools_called,
             "result_summary": result_summary,
-            "timestamp": datetime.now().isoformat(),
-            "session_id": session_id
+            "timestamp": time.time(),  # Formatted to ISO only on export
+            "session_id": session_id,
+            # Lowercased once here so history scans never re-lower
+            "_query_lower": query.lower(),
+            # Joined once here for conversation summaries
+            "_tools_called_str": ", ".join(tools_called)
         }
         
-        self.query_history.append(query_record)
+        query_record["_contrib"] = self._extract_contrib(query_record)
+        
+        # The deque drops its oldest record on append; take it out of the aggregates first
+        if self.query_history and len(self.query_history) == self.query_history.maxlen:
+            self._evict_preferences(self.query_history[0])
         
-        # Trim history
-        if len(self.query_history) > self.max_history:
-            self.query_history = self.query_history[-self.max_history:]
+        self.query_history.append(query_record)
+        self._add_preferences(query_record)
         
         # Update stats
         for tool in tools_called:
             self.tool_usage_stats[tool] += 1
     
+    @staticmethod
+    def _format_timestamp(timestamp: float) -> str:
+        """Format a stored epoch timestamp as ISO 8601 (local time)"""
+        return datetime.fromtimestamp(timestamp).isoformat()
+    
+    @classmethod
+    def _export_record(cls, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Public view of a history record"""
+        # Internal (underscore) fields are not part of the exported records
+        exported = {key: value for key, value in record.items() if not key.startswith("_")}
+        exported["timestamp"] = cls._format_timestamp(record["timestamp"])
+        return exported
+    
     def get_last_n_queries(self, n: int = 3) -> List[Dict[str, Any]]:
         """Get last N queries"""
-        return self.query_history[-n:] if self.query_history else []
+        return [
+            self._export_record(record)
+            for record in islice(self.query_history, max(0, len(self.query_history) - n), None)
+        ]
     
-    def infer_preferences(self) -> Dict[str, Any]:
-        """Infer user preferences from conversation history"""
+    def get_last_n_records(self, n: int = 3) -> List[Dict[str, Any]]:
+        """Get last N raw history records, internal fields included (do not mutate)"""
+        return list(islice(self.query_history, max(0, len(self.query_history) - n), None))
+    
+    def get_last_query_lower(self) -> str:
+        """Lowercased text of the most recent query (precomputed at track time)"""
+        return self.query_history[-1]["_query_lower"] if self.query_history else ""
+    
+    def _extract_contrib(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract a record's contribution to the preference aggregates"""
+        query_lower = record["_query_lower"]
         
-        if not self.query_history:
-            return {}
+        budget_range = None
+        if _BUDGET_RE.search(query_lower):
+            # Try to extract number
+            numbers = _BUDGET_NUMBER_RE.findall(query_lower)
+            if numbers:
+                # Clean and convert
+                amount = int(numbers[0].replace(',', ''))
+                budget_range = f"Under ₹{amount:,}"
         
-        preferences = {
-            "budget_range": self._extract_budget_range(),
-            "priority_features": self._extract_features(),
-            "brands_interested": self._extract_brands(),
-            "comparison_history": self._extract_comparisons()
-        }
+        # dict.fromkeys de-duplicates while keeping mention order (sets would not)
+        features = list(dict.fromkeys(
+            match.lastgroup for match in _FEATURE_RE.finditer(query_lower)
+        ))
+        brands = list(dict.fromkeys(
+            match.group(1).title() for match in _BRAND_RE.finditer(query_lower)
+        ))
         
-        return preferences
-    
-    def _extract_budget_range(self) -> Optional[str]:
-        """Extract budget mentions from queries"""
-        budget_keywords = ["budget", "under", "below", "₹", "inr", "price"]
-        
-        for record in reversed(self.query_history):
-            query_lower = record["query"].lower()
-            if any(kw in query_lower for kw in budget_keywords):
-                # Try to extract number
-                import re
-                numbers = re.findall(r'₹?\s*(\d+(?:,\d+)*)', query_lower)
-                if numbers:
-                    # Clean and convert
-                    amount = int(numbers[0].replace(',', ''))
-                    return f"Under ₹{amount:,}"
-        
-        return None
-    
-    def _extract_features(self) -> List[str]:
-        """Extract feature priorities from queries"""
-        feature_keywords = {
-            "camera": ["camera", "photography", "photo", "video"],
-            "battery": ["battery", "charging", "power"],
-            "performance": ["performance", "speed", "processor", "gaming"],
-            "display": ["display", "screen", "amoled"],
-            "storage": ["storage", "memory", "gb"]
+        # This was a comparison query
+        comparison = "compare_specs" in record["tools_called"]
+        
+        return {
+            "budget_range": budget_range,
+            "features": features,
+            "brands": brands,
+            "comparison": comparison
         }
+    
+    def _add_preferences(self, record: Dict[str, Any]):
+        """Fold a newly tracked record into the preference aggregates"""
+        contrib = record["_contrib"]
         
-        mentioned_features = set()
+        self._tool_counts.update(record["tools_called"])
         
-        for record in self.query_history:
-            query_lower = record["query"].lower()
-            for feature, keywords in feature_keywords.items():
-                if any(kw in query_lower for kw in keywords):
-                    mentioned_features.add(feature)
+        if contrib["budget_range"]:
+            self._budget_count += 1
+            self._latest_budget = contrib["budget_range"]
         
-        return list(mentioned_features)
+        if contrib["comparison"]:
+            self._comparison_count += 1
+            self._comparisons.append(record)
     
-    def _extract_brands(self) -> List[str]:
-        """Extract brand interests from queries"""
-        brands = ["samsung", "apple", "iphone", "oneplus", "google", "pixel", "xiaomi"]
+    def _evict_preferences(self, record: Dict[str, Any]):
+        """Remove the oldest retained record from the preference aggregates"""
+        contrib = record["_contrib"]
         
-        mentioned_brands = set()
+        self._tool_counts.subtract(record["tools_called"])
         
-        for record in self.query_history:
-            query_lower = record["query"].lower()
-            for brand in brands:
-                if brand in query_lower:
-                    mentioned_brands.add(brand.title())
+        if contrib["budget_range"]:
+            self._budget_count -= 1
+            if self._budget_count == 0:
+                # The evicted record was the only budget mention left
+                self._latest_budget = None
         
-        return list(mentioned_brands)
+        if contrib["comparison"]:
+            # The oldest comparison is only still queued when 3 or fewer remain
+            if self._comparison_count <= self._comparisons.maxlen:
+                self._comparisons.popleft()
+            self._comparison_count -= 1
     
-    def _extract_comparisons(self) -> List[Dict[str, str]]:
-        """Extract phone comparisons from history"""
-        comparisons = []
+    def infer_preferences(self) -> Dict[str, Any]:
+        """Infer user preferences from conversation history"""
+        
+        if not self.query_history:
+            return {}
         
-        for record in self.query_history:
-            if "compare_specs" in record["tools_called"]:
-                # This was a comparison query
-                comparisons.append({
+        # Features and brands are listed in first-mention order within the retained
+        # window, so the same window always serializes the same way. The context
+        # goes into the LLM prompt, and a stable order keeps the prefix cacheable.
+        # The per-record extraction is precomputed, so this is a short walk over
+        # at most max_history records, once per context rebuild.
+        preferences = {
+            "budget_range": self._latest_budget,
+            "priority_features": list(dict.fromkeys(
+                feature
+                for record in self.query_history
+                for feature in record["_contrib"]["features"]
+            )),
+            "brands_interested": list(dict.fromkeys(
+                brand
+                for record in self.query_history
+                for brand in record["_contrib"]["brands"]
+            )),
+            "comparison_history": [
+                {
                     "query": record["query"],
-                    "timestamp": record["timestamp"]
-                })
+                    "timestamp": self._format_timestamp(record["timestamp"])
+                }
+                for record in self._comparisons
+            ]
+        }
         
-        return comparisons[-3:]  # Last 3 comparisons
+        return preferences
     
     def get_conversation_theme(self) -> str:
         """Identify the overall conversation theme"""
@@ -140,13 +253,8 @@ class ConversationTracker:
         if not self.query_history:
             return "initial_exploration"
         
-        # Check for patterns
-        tool_counts = defaultdict(int)
-        for record in self.query_history:
-            for tool in record["tools_called"]:
-                tool_counts[tool] += 1
-        
-        # Determine theme
+        # Determine theme from the rolling per-window tool counts
+        tool_counts = self._tool_counts
         if tool_counts.get("compare_specs", 0) >= 2:
             return "comparison_shopping"
         elif tool_counts.get("get_price", 0) >= 3:
@@ -158,18 +266,36 @@ class ConversationTracker:
         else:
             return "general_inquiry"
     
-    def get_context(self) -> Dict[str, Any]:
-        """Generate complete conversation context"""
+    def get_context(self) -> ConversationContext:
+        """Generate complete conversation context (cached until the next track_query)
         
-        return {
-            "session_id": self.current_session_id,
-            "query_count": len(self.query_history),
-            "last_3_queries": self.get_last_n_queries(3),
-            "inferred_preferences": self.infer_preferences(),
-            "conversation_theme": self.get_conversation_theme(),
-            "tool_usage_stats": dict(self.tool_usage_stats)
-        }
+        The returned snapshot is shared; do not mutate it.
+        """
+        
+        if not self._dirty and self._context_cache is not None:
+            return self._context_cache
+        
+        self._context_cache = ConversationContext(
+            session_id=self.current_session_id,
+            query_count=len(self.query_history),
+            last_3_queries=self.get_last_n_queries(3),
+            inferred_preferences=self.infer_preferences(),
+            conversation_theme=self.get_conversation_theme(),
+            tool_usage_stats=dict(self.tool_usage_stats)
+        )
+        self._json_cache = {}
+        self._dirty = False
+        
+        return self._context_cache
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Export context as a plain dict"""
+        return self.get_context().as_dict()
     
-    def to_json(self) -> str:
-        """Export context as JSON"""
-        return json.dumps(self.get_context(), indent=2)
+    def to_json(self, pretty: bool = True) -> str:
+        """Export context as JSON (cached alongside the context)"""
+        context = self.get_context()
+        if pretty not in self._json_cache:
+            encode = dumps_pretty if pretty else dumps_compact
+            self._json_cache[pretty] = encode(context.as_dict())
+        return self._json_cache[pretty]
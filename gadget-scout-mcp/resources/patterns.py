@@ -0,0 +1,34 @@
+"""
+Patterns - Shared keyword regex builders
+
+Keywords are always escaped, so a table entry like "c++" or "5g+" matches
+literally instead of changing the pattern.
+"""
+
+from typing import Dict, Iterable, Sequence
+import re
+
+
+def _alternation(keywords: Iterable[str]) -> str:
+    """Escaped keywords joined as regex alternatives"""
+    return "|".join(map(re.escape, keywords))
+
+
+def compile_keywords(keywords: Iterable[str], overlapping: bool = False) -> "re.Pattern[str]":
+    """One alternation over the keywords, tried in the given order
+    
+    With overlapping=True the match is a zero-width lookahead capturing the
+    keyword as group 1, so finditer sees keywords that overlap each other.
+    """
+    if overlapping:
+        return re.compile("(?=(" + _alternation(keywords) + "))")
+    return re.compile(_alternation(keywords))
+
+
+def compile_keyword_groups(groups: Dict[str, Sequence[str]]) -> "re.Pattern[str]":
+    """One alternation with a named group per table entry"""
+    # Zero-width lookahead so overlapping keywords are all seen in one pass
+    return re.compile("(?=(?:" + "|".join(
+        f"(?P<{name}>{_alternation(keywords)})"
+        for name, keywords in groups.items()
+    ) + "))")
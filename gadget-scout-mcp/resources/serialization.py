@@ -0,0 +1,50 @@
+"""
+Serialization - Shared JSON encoding for exported resources
+"""
+
+from typing import Any, Dict
+import json
+
+# Optional accelerators. The stdlib fallback writes UTF-8 text without ASCII
+# escaping like orjson does, so exported payloads come out byte-identical
+# whichever packages are installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+    _msgspec_encoder = msgspec.json.Encoder()
+except ImportError:
+    _msgspec_encoder = None
+
+
+def dumps_pretty(obj: Any) -> str:
+    """Encode an object as indented JSON, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def dumps_compact(obj: Any) -> str:
+    """Encode an object as compact JSON (no indentation) for machine readers"""
+    if _msgspec_encoder is not None:
+        return _msgspec_encoder.encode(obj).decode()
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def join_pretty_members(members: Dict[str, str]) -> str:
+    """Assemble an indented JSON object from already-encoded member values
+    
+    Lets callers encode large, unchanging members once with dumps_pretty and
+    splice them in; the result matches dumps_pretty over the whole object.
+    """
+    if not members:
+        return "{}"
+    return "{\n" + ",\n".join(
+        f"  {json.dumps(key, ensure_ascii=False)}: " + value.replace("\n", "\n  ")
+        for key, value in members.items()
+    ) + "\n}"
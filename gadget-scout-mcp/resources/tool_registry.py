@@ -2,8 +2,11 @@
 Tool Registry - Manages tool metadata and usage patterns
 """
 
-from typing import List, Dict, Any
-import json
+from typing import List, Dict, Any, Optional
+from collections import Counter
+import heapq
+
+from resources.serialization import dumps_compact, dumps_pretty, join_pretty_members
 
 
 class ToolRegistry:
@@ -11,8 +14,19 @@ class ToolRegistry:
     
     def __init__(self):
         self.tools = self._initialize_tools()
-        self.tool_stats = {tool["name"]: {"calls": 0, "successes": 0, "failures": 0} 
-                          for tool in self.tools}
+        self._tool_by_name = {tool["name"]: tool for tool in self.tools}
+        # Flat per-tool counters; failures are derived as calls - successes
+        self._calls = Counter()
+        self._successes = Counter()
+        # Bumped on every stats change; to_json output is cached per version
+        self._stats_version = 0
+        self._json_cache = {}  # Keyed by pretty flag
+        self._json_cache_version = -1
+        self._analytics_cache: Optional[Dict[str, Any]] = None
+        self._analytics_version = -1
+        # Tool metadata and sequences never change after init; encode them once
+        self._tools_json = dumps_pretty(self.tools)
+        self._sequences_json = dumps_pretty(self.get_common_sequences())
     
     def _initialize_tools(self) -> List[Dict[str, Any]]:
         """Initialize tool metadata"""
@@ -180,48 +194,51 @@ class ToolRegistry:
     
     def get_tool(self, name: str) -> Dict[str, Any]:
         """Get tool metadata by name"""
-        for tool in self.tools:
-            if tool["name"] == name:
-                return tool
-        return None
+        return self._tool_by_name.get(name)
     
     def get_all_tools(self) -> List[Dict[str, Any]]:
         """Get all tools"""
         return self.tools
     
+    @property
+    def tool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-tool call/success/failure counts, in registry order"""
+        return {
+            name: {
+                "calls": self._calls[name],
+                "successes": self._successes[name],
+                "failures": self._calls[name] - self._successes[name]
+            }
+            for name in self._tool_by_name
+        }
+    
     def record_tool_call(self, tool_name: str, success: bool):
         """Record a tool call for analytics"""
-        if tool_name in self.tool_stats:
-            self.tool_stats[tool_name]["calls"] += 1
+        if tool_name in self._tool_by_name:
+            self._calls[tool_name] += 1
             if success:
-                self.tool_stats[tool_name]["successes"] += 1
-            else:
-                self.tool_stats[tool_name]["failures"] += 1
+                self._successes[tool_name] += 1
+            self._stats_version += 1
     
     def get_success_rate(self, tool_name: str) -> float:
         """Get success rate for a tool"""
-        stats = self.tool_stats.get(tool_name, {})
-        calls = stats.get("calls", 0)
+        calls = self._calls[tool_name]
         if calls == 0:
             return 0.0
-        successes = stats.get("successes", 0)
-        return successes / calls
+        return self._successes[tool_name] / calls
     
     def get_most_used_tools(self, limit: int = 5) -> List[Dict[str, Any]]:
         """Get most frequently used tools"""
-        sorted_tools = sorted(
-            self.tool_stats.items(),
-            key=lambda x: x[1]["calls"],
-            reverse=True
-        )
+        # Same ordering as sorted(..., reverse=True)[:limit], without a full sort
+        top_tools = heapq.nlargest(limit, self._tool_by_name, key=self._calls.__getitem__)
         
         return [
             {
                 "tool": name,
-                "calls": stats["calls"],
+                "calls": self._calls[name],
                 "success_rate": self.get_success_rate(name)
             }
-            for name, stats in sorted_tools[:limit]
+            for name in top_tools
         ]
     
     def get_common_sequences(self) -> List[List[str]]:
@@ -236,11 +253,40 @@ class ToolRegistry:
             ["search_devices", "compare_specs"]
         ]
     
-    def to_json(self) -> str:
-        """Export registry as JSON"""
-        return json.dumps({
+    def get_analytics(self) -> Dict[str, Any]:
+        """Usage analytics (rebuilt only after stats change)"""
+        if self._analytics_version != self._stats_version:
+            self._analytics_cache = {
+                "most_used_tools": self.get_most_used_tools(),
+                "common_sequences": self.get_common_sequences(),
+                "tool_stats": self.tool_stats
+            }
+            self._analytics_version = self._stats_version
+        return self._analytics_cache
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Export registry as a plain dict"""
+        return {
             "tools": self.tools,
             "stats": self.tool_stats,
             "most_used": self.get_most_used_tools(),
             "common_sequences": self.get_common_sequences()
-        }, indent=2)
+        }
+    
+    def to_json(self, pretty: bool = True) -> str:
+        """Export registry as JSON (re-encoded only after stats change)"""
+        if self._json_cache_version != self._stats_version:
+            self._json_cache = {}
+            self._json_cache_version = self._stats_version
+        
+        if pretty not in self._json_cache:
+            if pretty:
+                self._json_cache[pretty] = join_pretty_members({
+                    "tools": self._tools_json,
+                    "stats": dumps_pretty(self.tool_stats),
+                    "most_used": dumps_pretty(self.get_most_used_tools()),
+                    "common_sequences": self._sequences_json
+                })
+            else:
+                self._json_cache[pretty] = dumps_compact(self.to_dict())
+        return self._json_cache[pretty]
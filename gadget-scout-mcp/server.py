@@ -3,8 +3,11 @@ Gadget Scout MCP Server - Main server implementation
 """
 
 import asyncio
-import json
+import atexit
+import functools
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any, Sequence
 from mcp.server import Server
 from mcp.types import Resource, Tool, Prompt, TextContent, ImageContent, EmbeddedResource
@@ -14,28 +17,98 @@ from mcp.server.stdio import stdio_server
 from resources.conversation import ConversationTracker
 from resources.tool_registry import ToolRegistry
 from prompts.query_context import QueryContextGenerator
+from prompts.summary import build_summary
+from resources.serialization import dumps_compact
 import config
 
-# Setup logging
+# Optional libuv-backed event loop; the default asyncio loop is used when missing
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Setup logging: handlers only enqueue records; a background listener thread
+# does the file/stream writes off the request path
+_LOG_LEVEL = getattr(logging, config.LOG_LEVEL)  # Resolved once at import
+_log_queue = queue.Queue(-1)
 logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
+    level=_LOG_LEVEL,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(config.LOG_FILE),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_queue)]
+)
+_log_listener = QueueListener(
+    _log_queue,
+    logging.FileHandler(config.LOG_FILE),
+    logging.StreamHandler()
 )
+_log_listener.start()
+atexit.register(_log_listener.stop)  # Flush queued records on exit
 logger = logging.getLogger(__name__)
 
 # Initialize components
 conversation_tracker = ConversationTracker(max_history=config.MAX_HISTORY_LENGTH)
 tool_registry = ToolRegistry()
-context_generator = QueryContextGenerator(conversation_tracker, tool_registry)
+context_generator = QueryContextGenerator(
+    conversation_tracker, tool_registry, cache_size=config.CONTEXT_CACHE_SIZE
+)
 
 # Create MCP server
 server = Server(config.SERVER_NAME)
 
-logger.info(f"Initializing {config.SERVER_NAME} v{config.SERVER_VERSION}")
+logger.info("Initializing %s v%s", config.SERVER_NAME, config.SERVER_VERSION)
+
+
+# Static resource list, built once at import
+_RESOURCES = [
+    Resource(
+        uri="gadget-scout://tools/registry",
+        name="Tool Registry",
+        description="Complete registry of all available tools with metadata and usage patterns",
+        mimeType="application/json"
+    ),
+    Resource(
+        uri="gadget-scout://conversation/current",
+        name="Current Conversation Context",
+        description="Context from current conversation including history and inferred preferences",
+        mimeType="application/json"
+    ),
+    Resource(
+        uri="gadget-scout://analytics/tools",
+        name="Tool Analytics",
+        description="Usage statistics and patterns for all tools",
+        mimeType="application/json"
+    )
+]
+
+# Static prompt list, built once at import
+_PROMPTS = [
+    Prompt(
+        name="get_query_context",
+        description="Generate intelligent context for a user query",
+        arguments=[
+            {
+                "name": "query",
+                "description": "The user's query",
+                "required": True
+            }
+        ]
+    ),
+    Prompt(
+        name="get_conversation_summary",
+        description="Get a summary of the current conversation",
+        arguments=[]
+    )
+]
+
+# Static tool list; the registry's tool metadata never changes after init
+_TOOLS = [
+    Tool(
+        name=tool_meta["name"],
+        description=tool_meta["description"],
+        inputSchema=tool_meta["input_schema"]
+    )
+    for tool_meta in tool_registry.get_all_tools()
+]
 
 
 @server.list_resources()
@@ -43,49 +116,43 @@ async def list_resources() -> list[Resource]:
     """List available resources"""
     logger.info("Listing resources")
     
-    return [
-        Resource(
-            uri="gadget-scout://tools/registry",
-            name="Tool Registry",
-            description="Complete registry of all available tools with metadata and usage patterns",
-            mimeType="application/json"
-        ),
-        Resource(
-            uri="gadget-scout://conversation/current",
-            name="Current Conversation Context",
-            description="Context from current conversation including history and inferred preferences",
-            mimeType="application/json"
-        ),
-        Resource(
-            uri="gadget-scout://analytics/tools",
-            name="Tool Analytics",
-            description="Usage statistics and patterns for all tools",
-            mimeType="application/json"
-        )
-    ]
+    return _RESOURCES
+
+
+# Resources are read by machines, so they are sent as compact JSON
+def _read_tool_registry() -> str:
+    """Tool registry resource"""
+    return tool_registry.to_json(pretty=False)
+
+
+def _read_conversation() -> str:
+    """Current conversation context resource"""
+    return conversation_tracker.to_json(pretty=False)
+
+
+def _read_tool_analytics() -> str:
+    """Tool analytics resource"""
+    return dumps_compact(tool_registry.get_analytics())
+
+
+# Resource URI -> handler, so dispatch is a single dict lookup
+_RESOURCE_HANDLERS = {
+    "gadget-scout://tools/registry": _read_tool_registry,
+    "gadget-scout://conversation/current": _read_conversation,
+    "gadget-scout://analytics/tools": _read_tool_analytics
+}
 
 
 @server.read_resource()
 async def read_resource(uri: str) -> str:
     """Read a resource by URI"""
-    logger.info(f"Reading resource: {uri}")
-    
-    if uri == "gadget-scout://tools/registry":
-        return tool_registry.to_json()
-    
-    elif uri == "gadget-scout://conversation/current":
-        return conversation_tracker.to_json()
+    logger.info("Reading resource: %s", uri)
     
-    elif uri == "gadget-scout://analytics/tools":
-        analytics = {
-            "most_used_tools": tool_registry.get_most_used_tools(),
-            "common_sequences": tool_registry.get_common_sequences(),
-            "tool_stats": tool_registry.tool_stats
-        }
-        return json.dumps(analytics, indent=2)
-    
-    else:
+    handler = _RESOURCE_HANDLERS.get(uri)
+    if handler is None:
         raise ValueError(f"Unknown resource URI: {uri}")
+    
+    return handler()
 
 
 @server.list_tools()
@@ -93,32 +160,26 @@ async def list_tools() -> list[Tool]:
     """List available tools"""
     logger.info("Listing tools")
     
-    tools = []
-    for tool_meta in tool_registry.get_all_tools():
-        tools.append(Tool(
-            name=tool_meta["name"],
-            description=tool_meta["description"],
-            inputSchema=tool_meta["input_schema"]
-        ))
-    
-    return tools
+    return _TOOLS
+
+
+@functools.lru_cache(maxsize=128)
+def _noop_text(name: str) -> str:
+    """Placeholder tool result text; it only depends on the tool name"""
+    return f"Tool '{name}' should be called by the notebook. MCP server tracks metadata only."
 
 
 @server.call_tool()
 async def call_tool(name: str, arguments: Any) -> Sequence[TextContent | ImageContent | EmbeddedResource]:
     """Call a tool (placeholder - actual tools are in the notebook)"""
-    logger.info(f"Tool call: {name} with args: {arguments}")
+    if logger.isEnabledFor(logging.INFO):  # Skip building the call for large argument payloads
+        logger.info("Tool call: %s with args: %r", name, arguments)
     
     # Record the call
     tool_registry.record_tool_call(name, success=True)
     
     # Return a message indicating tools are handled by the notebook
-    return [
-        TextContent(
-            type="text",
-            text=f"Tool '{name}' should be called by the notebook. MCP server tracks metadata only."
-        )
-    ]
+    return [TextContent(type="text", text=_noop_text(name))]
 
 
 @server.list_prompts()
@@ -126,86 +187,62 @@ async def list_prompts() -> list[Prompt]:
     """List available prompts"""
     logger.info("Listing prompts")
     
-    return [
-        Prompt(
-            name="get_query_context",
-            description="Generate intelligent context for a user query",
-            arguments=[
-                {
-                    "name": "query",
-                    "description": "The user's query",
-                    "required": True
-                }
-            ]
-        ),
-        Prompt(
-            name="get_conversation_summary",
-            description="Get a summary of the current conversation",
-            arguments=[]
-        )
-    ]
+    return _PROMPTS
+
+
+def _prompt_query_context(arguments: dict[str, str] | None) -> str:
+    """Context prompt for the query argument"""
+    query = arguments.get("query", "") if arguments else ""
+    if not query:
+        return "Error: query argument is required"
+    
+    # Generate context
+    context = context_generator.generate_context(query)
+    return context
+
+
+def _prompt_conversation_summary(arguments: dict[str, str] | None) -> str:
+    """Summary prompt for the current conversation"""
+    return build_summary(conversation_tracker)
+
+
+# Prompt name -> handler, so dispatch is a single dict lookup
+_PROMPT_HANDLERS = {
+    "get_query_context": _prompt_query_context,
+    "get_conversation_summary": _prompt_conversation_summary
+}
 
 
 @server.get_prompt()
 async def get_prompt(name: str, arguments: dict[str, str] | None = None) -> str:
     """Get a prompt with arguments"""
-    logger.info(f"Getting prompt: {name} with args: {arguments}")
+    logger.info("Getting prompt: %s with args: %s", name, arguments)
     
-    if name == "get_query_context":
-        query = arguments.get("query", "") if arguments else ""
-        if not query:
-            return "Error: query argument is required"
-        
-        # Generate context
-        context = context_generator.generate_context(query)
-        return context
+    handler = _PROMPT_HANDLERS.get(name)
+    if handler is None:
+        raise ValueError(f"Unknown prompt: {name}")
     
-    elif name == "get_conversation_summary":
-        # Get conversation context
-        ctx = conversation_tracker.get_context()
-        
-        summary = f"""
-CONVERSATION SUMMARY
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    return handler(arguments)
 
-📝 Queries So Far: {ctx['query_count']}
 
-"""
-        # Add last queries
-        for i, query_record in enumerate(ctx.get('last_3_queries', []), 1):
-            summary += f"{i}️⃣ \"{query_record['query']}\"\n"
-            summary += f"   Tools Used: {', '.join(query_record['tools_called'])}\n\n"
-        
-        # Add inferred preferences
-        prefs = ctx.get('inferred_preferences', {})
-        if prefs:
-            summary += "🎯 Inferred Preferences:\n"
-            if prefs.get('budget_range'):
-                summary += f"   Budget: {prefs['budget_range']}\n"
-            if prefs.get('priority_features'):
-                summary += f"   Features: {', '.join(prefs['priority_features'])}\n"
-            if prefs.get('brands_interested'):
-                summary += f"   Brands: {', '.join(prefs['brands_interested'])}\n"
-        
-        summary += f"\n🔑 Conversation Theme: {ctx.get('conversation_theme', 'general')}\n"
-        
-        return summary.strip()
-    
-    else:
-        raise ValueError(f"Unknown prompt: {name}")
+# Built once all handlers are registered, since it inspects them
+_INIT_OPTIONS = server.create_initialization_options()
 
 
 async def main():
     """Main entry point"""
-    logger.info(f"Starting {config.SERVER_NAME} server")
+    logger.info("Starting %s server", config.SERVER_NAME)
     
     async with stdio_server() as (read_stream, write_stream):
         await server.run(
             read_stream,
             write_stream,
-            server.create_initialization_options()
+            _INIT_OPTIONS
         )
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -2,11 +2,82 @@
 Simple test script for the MCP server
 """
 
+import ast
 import asyncio
 import json
-from resources.conversation import ConversationTracker
+import re
+from collections import Counter
+from resources.conversation import ConversationTracker, _BRANDS, _BUDGET_KW, _FEATURE_KW
 from resources.tool_registry import ToolRegistry
 from prompts.query_context import QueryContextGenerator
+from keyword_stats import count_keyword_hits, format_category_keywords, rank_category_keywords
+
+
+def mentions_in_order(query_lower, table):
+    """Table entries whose keywords occur in the query, by first position"""
+    positions = {}
+    for name, keywords in table.items():
+        found = [query_lower.find(keyword) for keyword in keywords if keyword in query_lower]
+        if found:
+            positions[name] = min(found)
+    return sorted(positions, key=positions.get)
+
+
+def recompute_preferences(conversation):
+    """Brute-force preferences and theme from the raw queries in the retained window"""
+    if not conversation.query_history:
+        return {}, "initial_exploration"
+    
+    budget_range = None
+    # Dicts keep first-mention order within the window
+    features, brands, comparisons = {}, {}, []
+    tool_counts = Counter()
+    for record in conversation.query_history:
+        query_lower = record["query"].lower()
+        if any(keyword in query_lower for keyword in _BUDGET_KW):
+            amounts = re.findall(r"\d+(?:,\d+)*", query_lower)
+            if amounts:
+                budget_range = f"Under ₹{int(amounts[0].replace(',', '')):,}"
+        features.update(dict.fromkeys(mentions_in_order(query_lower, _FEATURE_KW)))
+        brands.update(dict.fromkeys(
+            brand.title()
+            for brand in mentions_in_order(query_lower, {brand: (brand,) for brand in _BRANDS})
+        ))
+        if "compare_specs" in record["tools_called"]:
+            comparisons.append(record["query"])
+        tool_counts.update(record["tools_called"])
+    
+    if tool_counts["compare_specs"] >= 2:
+        theme = "comparison_shopping"
+    elif tool_counts["get_price"] >= 3:
+        theme = "price_focused"
+    elif tool_counts["get_reviews"] >= 2:
+        theme = "review_research"
+    elif tool_counts["search_devices"] >= 2:
+        theme = "discovery_exploration"
+    else:
+        theme = "general_inquiry"
+    
+    preferences = {
+        "budget_range": budget_range,
+        "priority_features": list(features),
+        "brands_interested": list(brands),
+        "comparison_history": comparisons[-3:]
+    }
+    return preferences, theme
+
+
+def check_preferences(conversation):
+    """Assert the rolling preference aggregates match a full recompute"""
+    expected, expected_theme = recompute_preferences(conversation)
+    preferences = conversation.infer_preferences()
+    if preferences:
+        # Order is compared too: the same window must serialize the same way
+        preferences["comparison_history"] = [
+            record["query"] for record in preferences["comparison_history"]
+        ]
+    assert preferences == expected, (preferences, expected)
+    assert conversation.get_conversation_theme() == expected_theme
 
 
 async def test_mcp_components():
@@ -47,9 +118,9 @@ async def test_mcp_components():
     )
     
     context = conversation.get_context()
-    print(f"   Tracked {context['query_count']} queries")
-    print(f"   Theme: {context['conversation_theme']}")
-    print(f"   Inferred preferences: {context['inferred_preferences']}")
+    print(f"   Tracked {context.query_count} queries")
+    print(f"   Theme: {context.conversation_theme}")
+    print(f"   Inferred preferences: {context.inferred_preferences}")
     print("✅ Conversation tracking working")
     
     # Test 3: Context Generation
@@ -68,8 +139,96 @@ async def test_mcp_components():
     conversation_json = conversation.to_json()
     print(f"   Tool registry JSON: {len(registry_json)} characters")
     print(f"   Conversation JSON: {len(conversation_json)} characters")
+    # Internal record fields stay out of the exported schema
+    assert "_tools_called_str" not in conversation_json and "_query_lower" not in conversation_json
+    
+    # Context snapshots are shared until the next track_query, then replaced
+    snapshot = conversation.get_context()
+    assert conversation.get_context() is snapshot
+    snapshot_json = conversation.to_json(pretty=False)
+    conversation.track_query("Pixel 8 camera review", ["get_reviews"], "ok", "test_session")
+    assert conversation.get_context() is not snapshot
+    assert snapshot.query_count == 2 and len(snapshot.last_3_queries) == 2
+    assert "camera" not in snapshot.inferred_preferences["priority_features"]
+    assert conversation.to_json(pretty=False) != snapshot_json
+    print("   Snapshots are reused until the next query and left intact after it")
     print("✅ Resource export working")
     
+    # Test 5: Preference aggregates across history eviction
+    print("\n6️⃣ Testing Preference Aggregates...")
+    window = ConversationTracker(max_history=5)
+    queries = [
+        ("Best phone under 40,000", ["search_devices"]),
+        ("Compare Samsung S24 and Pixel 8 camera", ["compare_specs"]),
+        ("Phones below ₹25,000 with good performance", ["search_devices", "get_price"]),
+        ("Samsung vs iPhone display", ["compare_specs", "get_price"]),
+        ("Compare Xiaomi and Realme", ["compare_specs"]),
+        ("Compare iPhone 15 and OnePlus 12", ["compare_specs", "get_price"]),
+        ("OnePlus battery life", ["get_reviews"]),
+        ("Reviews for Pixel 8", ["get_reviews"]),
+        ("Nothing Phone camera specs", ["get_specs"]),
+        ("Pixel 8 price", ["get_price"]),
+        ("Budget gaming phone", ["search_devices", "get_price"]),
+        ("Display and battery under 30,000 with 8 gb storage", ["search_devices"]),
+        ("Compare Vivo and Oppo", ["compare_specs"]),
+    ]
+    # Run past max_history so records are evicted, then switch sessions mid-way
+    for i, (query, tools_called) in enumerate(queries + queries[:7]):
+        session_id = "session_a" if i < len(queries) else "session_b"
+        window.track_query(query, tools_called, "ok", session_id)
+        check_preferences(window)
+    print(f"   Checked the {window.max_history}-query window after each of {i + 1} queries")
+    
+    # The order must not depend on queries that have already been evicted
+    evicted = ConversationTracker(max_history=3)
+    retained = ConversationTracker(max_history=3)
+    order_queries = ["good camera phone", "battery life phone", "camera zoom", "samsung or apple"]
+    for query in order_queries:
+        evicted.track_query(query, [], "ok", "order_session")
+    for query in order_queries[1:]:
+        retained.track_query(query, [], "ok", "order_session")
+    assert evicted.infer_preferences()["priority_features"] == ["battery", "camera"]
+    for key in ("priority_features", "brands_interested"):
+        assert evicted.infer_preferences()[key] == retained.infer_preferences()[key], key
+    print("✅ Preference aggregates match a full recompute")
+    
+    # Test 6: Phone name extraction
+    print("\n7️⃣ Testing Phone Name Extraction...")
+    phone_cases = {
+        "compare samsung galaxy s24 ultra and iphone": ["samsung galaxy s24 ultra", "iphone"],
+        "s24 ultra vs samsung s24 ultra": ["samsung galaxy s24 ultra"],
+        "iphone 15 pro max or pixel 8 pro or oneplus": ["iphone 15 pro max", "pixel 8 pro", "oneplus"],
+        "best budget phone": [],
+    }
+    for query, expected_phones in phone_cases.items():
+        phones = context_gen._extract_phone_names(query)
+        assert phones == expected_phones, (query, phones)
+        print(f"   {query!r} -> {phones}")
+    print("✅ Phone aliases resolve to one canonical name each")
+    
+    # Test 7: Keyword frequency report
+    print("\n8️⃣ Testing Keyword Frequency Report...")
+    query_log = [
+        "Samsung S24 price",
+        "iPhone 15 price in INR",
+        "Pixel 8 specs and price",
+        "Phones under ₹30,000",
+        "Budget phones below 20,000 under ₹25,000",
+        "Best camera phone",
+    ]
+    hits = count_keyword_hits(query_log)
+    ranked = rank_category_keywords(hits)
+    assert ranked["specific_information"] == (
+        "price", "specs", "what is", "tell me about", "cost", "review"
+    ), ranked["specific_information"]
+    assert ranked["budget_search"] == ("under", "₹", "below", "budget", "inr"), ranked["budget_search"]
+    # Unseen keywords keep their order, and the report is a valid literal of the ranking
+    assert ranked["comparison"] == ("compare", "vs", "versus", "which is better", "difference between")
+    report = format_category_keywords(hits)
+    assert ast.literal_eval(report.split("=", 1)[1].strip()) == ranked
+    print(f"   Ranked keywords from {len(query_log)} logged queries")
+    print("✅ Keyword report reorders keywords by hit count")
+    
     print("\n" + "=" * 80)
     print("✅ All tests passed! MCP server components are working correctly.")
     print("=" * 80)
@@ -7,20 +7,41 @@ which is compatible with Google Colab environment.
 
 import sys
 import os
+import logging
+from functools import wraps
 from typing import Optional, Dict, Any
 
+# Make the MCP components importable once, without growing sys.path on reruns
+_MCP_DIR = '/content/gadget-scout-mcp'
+if _MCP_DIR not in sys.path:
+    sys.path.append(_MCP_DIR)
+
+from resources.conversation import ConversationTracker
+from resources.tool_registry import ToolRegistry
+from prompts.query_context import QueryContextGenerator
+from prompts.summary import build_summary
+
+logger = logging.getLogger(__name__)
+
+
+def _safe(default):
+    """Log and swallow errors from a client method, returning default instead"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                logger.warning("%s failed: %s", func.__name__, e)
+                return default
+        return wrapper
+    return decorator
+
 
 class ColabMCPClient:
     """Simplified MCP Client for Google Colab"""
     
     def __init__(self):
-        # Import MCP components directly
-        sys.path.append('/content/gadget-scout-mcp')
-        
-        from resources.conversation import ConversationTracker
-        from resources.tool_registry import ToolRegistry
-        from prompts.query_context import QueryContextGenerator
-        
         # Initialize components
         self.conversation = ConversationTracker(max_history=10)
         self.registry = ToolRegistry()
@@ -28,50 +49,17 @@ class ColabMCPClient:
         
         print("✅ MCP components loaded (Colab mode)")
     
+    @_safe("")
     def get_query_context(self, query: str) -> str:
         """Get intelligent context for a query"""
-        try:
-            context = self.context_gen.generate_context(query)
-            return context
-        except Exception as e:
-            print(f"Warning: Context generation failed: {e}")
-            return ""
+        return self.context_gen.generate_context(query)
     
+    @_safe("")
     def get_conversation_summary(self) -> str:
         """Get conversation summary"""
-        try:
-            ctx = self.conversation.get_context()
-            
-            summary = f"""
-CONVERSATION SUMMARY
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-📝 Queries So Far: {ctx['query_count']}
-
-"""
-            # Add last queries
-            for i, query_record in enumerate(ctx.get('last_3_queries', []), 1):
-                summary += f"{i}️⃣ \"{query_record['query']}\"\n"
-                summary += f"   Tools Used: {', '.join(query_record['tools_called'])}\n\n"
-            
-            # Add inferred preferences
-            prefs = ctx.get('inferred_preferences', {})
-            if prefs:
-                summary += "🎯 Inferred Preferences:\n"
-                if prefs.get('budget_range'):
-                    summary += f"   Budget: {prefs['budget_range']}\n"
-                if prefs.get('priority_features'):
-                    summary += f"   Features: {', '.join(prefs['priority_features'])}\n"
-                if prefs.get('brands_interested'):
-                    summary += f"   Brands: {', '.join(prefs['brands_interested'])}\n"
-            
-            summary += f"\n🔑 Conversation Theme: {ctx.get('conversation_theme', 'general')}\n"
-            
-            return summary.strip()
-        except Exception as e:
-            print(f"Warning: Summary generation failed: {e}")
-            return ""
+        return build_summary(self.conversation)
     
+    @_safe(None)
     def track_query(
         self,
         query: str,
@@ -80,15 +68,12 @@ CONVERSATION SUMMARY
         session_id: str
     ):
         """Track a query for future context"""
-        try:
-            self.conversation.track_query(
-                query=query,
-                tools_called=tools_called,
-                result_summary=result_summary,
-                session_id=session_id
-            )
-        except Exception as e:
-            print(f"Warning: Query tracking failed: {e}")
+        self.conversation.track_query(
+            query=query,
+            tools_called=tools_called,
+            result_summary=result_summary,
+            session_id=session_id
+        )
 
 
 # Global instance
@@ -96,11 +81,11 @@ _colab_mcp_client: Optional[ColabMCPClient] = None
 
 
 def initialize_colab_mcp():
-    """Initialize the Colab-compatible MCP client"""
+    """Initialize the Colab-compatible MCP client (reused across reruns)"""
     global _colab_mcp_client
     
     try:
-        _colab_mcp_client = ColabMCPClient()
+        _colab_mcp_client = _colab_mcp_client or ColabMCPClient()
         return _colab_mcp_client
     except Exception as e:
         print(f"Failed to initialize MCP: {e}")